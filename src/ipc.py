@@ -1,11 +1,81 @@
-def enviar_tarefa(queue, tarefa):
-    queue.put(tarefa)
+import struct
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
 
-def receber_resposta(queue, block=True, timeout=None):
-    try:
-        if block:
-            return queue.get(timeout=timeout)
-        else:
-            return queue.get_nowait()
-    except Exception:
+# Quadros binários de tamanho fixo no lugar de dicts serializados com pickle
+# tarefa:   id, slot de telemetria, prioridade, restante, trabalho (fatia RR
+#           ou execução completa)
+# resposta: id, worker, duração, restante (cpu/memória vão pela Telemetria)
+# Um quadro vazio pede para o worker encerrar, fora do espaço de ids.
+TASK_FMT = struct.Struct("!IIBdd")
+RESP_FMT = struct.Struct("!IIdd")
+
+# Faixas aceitas pelos campos "I" (ids) e "B" (prioridade) dos quadros
+ID_MAX = 2**32 - 1
+PRIORIDADE_MAX = 255
+
+
+def enviar_tarefa(conn, tarefa):
+    work = tarefa["slice"] if "slice" in tarefa else tarefa["exec_time"]
+    conn.send_bytes(TASK_FMT.pack(tarefa["id"], tarefa["slot"], tarefa["priority"], tarefa["remaining"], work))
+
+def encerrar_worker(conn):
+    conn.send_bytes(b"")
+
+def receber_tarefa(conn):
+    # None quando o orquestrador pediu para encerrar
+    dados = conn.recv_bytes()
+    if not dados:
         return None
+    tid, slot, priority, remaining, work = TASK_FMT.unpack(dados)
+    return {"id": tid, "slot": slot, "priority": priority, "remaining": remaining, "work": work}
+
+def enviar_resposta(conn, resp):
+    conn.send_bytes(RESP_FMT.pack(resp["id"], resp["worker"], resp["duration"], resp["remaining"]))
+
+def receber_resposta(conn):
+    tid, worker, duration, remaining = RESP_FMT.unpack(conn.recv_bytes())
+    return {
+        "id": tid,
+        "worker": worker,
+        "duration": duration,
+        "remaining": remaining,
+    }
+
+def aguardar_respostas(conns, timeout=None):
+    # Bloqueia até algum worker ter dados (ou o timeout estourar) e lê
+    # tudo o que já chegou nas conexões prontas
+    respostas = []
+    for conn in wait(conns, timeout):
+        while conn.poll():
+            respostas.append(receber_resposta(conn))
+    return respostas
+
+
+class Telemetria:
+    # CPU e memória em memória compartilhada: dois doubles por tarefa,
+    # indexados pela posição da requisição em cfg["requisicoes"]. Cada
+    # tarefa está em no máximo um worker por vez, então a linha não é
+    # sobrescrita por outra tarefa antes do orquestrador ler a resposta,
+    # mesmo com vários eventos do mesmo servidor no mesmo lote.
+
+    def __init__(self, n_slots=0, nome=None):
+        if nome is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, n_slots) * 16)
+        else:
+            self._shm = shared_memory.SharedMemory(name=nome)
+        self.nome = self._shm.name
+        self._dados = self._shm.buf.cast("d")
+
+    def escrever(self, slot, cpu, memoria):
+        self._dados[2 * slot] = cpu
+        self._dados[2 * slot + 1] = memoria
+
+    def ler(self, slot):
+        return self._dados[2 * slot], self._dados[2 * slot + 1]
+
+    def fechar(self, remover=False):
+        self._dados.release()
+        self._shm.close()
+        if remover:
+            self._shm.unlink()
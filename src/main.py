@@ -1,9 +1,10 @@
-import json, time, os
-from multiprocessing import Queue
-from scheduler import Scheduler
+import argparse, json, logging, sys, time, os
+from scheduler import Scheduler, CHAVES, BALANCEADORES, schedule_tick
 from worker import iniciar_workers
-from ipc import enviar_tarefa, receber_resposta
-from utils import ts
+from ipc import enviar_tarefa, encerrar_worker, aguardar_respostas, Telemetria, ID_MAX, PRIORIDADE_MAX
+from utils import ts_ns
+
+log = logging.getLogger(__name__)
 
 
 def carregar_config():
@@ -13,181 +14,238 @@ def carregar_config():
         return json.load(f)
 
 
-def prioridade_label(n):
-    return {1: "Alta", 2: "Média", 3: "Baixa"}.get(n, "?")
+def validar_config(cfg):
+    # ids e prioridades viajam em campos de tamanho fixo (ver ipc.TASK_FMT)
+    balanceamento = cfg.get("balanceamento", "menor_carga")
+    if balanceamento not in BALANCEADORES:
+        raise ValueError(
+            f"balanceamento desconhecido: {balanceamento!r} (opções: {', '.join(BALANCEADORES)})"
+        )
+    for s in cfg["servidores"]:
+        if not 0 <= s["id"] <= ID_MAX:
+            raise ValueError(f"id de servidor fora da faixa 0..{ID_MAX}: {s['id']}")
+    for r in cfg["requisicoes"]:
+        if not 0 <= r["id"] <= ID_MAX:
+            raise ValueError(f"id de requisição fora da faixa 0..{ID_MAX}: {r['id']}")
+        if not 0 <= r["prioridade"] <= PRIORIDADE_MAX:
+            raise ValueError(
+                f"prioridade da requisição {r['id']} fora da faixa 0..{PRIORIDADE_MAX}: {r['prioridade']}"
+            )
 
 
-def executar_politica(policy, cfg):
-    print("\n" + "=" * 60)
-    print(f"=== INICIANDO SIMULAÇÃO: {policy.upper()} ===")
-    print("=" * 60)
+_PRIORIDADES = ("?", "Alta", "Média", "Baixa")
 
-    start = time.time()
-    quantum = cfg["quantum"]
 
-    # Cada requisição vira uma tarefa pendente
-    # last_worker: guarda o último servidor que executou essa tarefa
-    pending = [{
-        **r,
-        "arrival_time": start,
-        "remaining": r["tempo_exec"],
-        "running": False,
-        "last_worker": None
-    } for r in cfg["requisicoes"]]
+def prioridade_label(n):
+    return _PRIORIDADES[n] if 1 <= n <= 3 else "?"
+
+
+def _rr_msg_builder(quantum_f, ids, prioridades, remaining):
+    def build(k):
+        r = remaining[k]
+        return {
+            "id": ids[k],
+            "slot": k,
+            "priority": prioridades[k],
+            "remaining": r,
+            "slice": quantum_f if r > quantum_f else r
+        }
+    return build
+
+
+def _exec_msg_builder(ids, prioridades, remaining):
+    def build(k):
+        return {
+            "id": ids[k],
+            "slot": k,
+            "priority": prioridades[k],
+            "remaining": remaining[k],
+            "exec_time": remaining[k]
+        }
+    return build
+
+
+def _make_runner(policy):
+    # Especializa a simulação para uma política: chave da fila, formato da
+    # mensagem e rótulo ficam fixos na closure, sem testar policy no laço
+    rotulo = policy.upper()
+    campo_chave = CHAVES.get(policy)
+    rr = policy == "rr"
+
+    def executar_politica(cfg, conexoes, telemetria):
+        # conexoes: {sid: Pipe} dos workers já iniciados, reaproveitados
+        # entre as políticas; telemetria: CPU/RAM reportadas pelos workers
+        sys.stdout.write(f"\n{'=' * 60}\n=== INICIANDO SIMULAÇÃO: {rotulo} ===\n{'=' * 60}\n")
+
+        # Relógio monotônico em nanossegundos inteiros; só vira segundos
+        # (float) nos logs e nas métricas finais
+        start = time.monotonic_ns()
+        quantum_f = float(cfg["quantum"])
+
+        # Estado das tarefas em listas paralelas, indexadas pela posição da
+        # requisição em cfg["requisicoes"] (idx_por_id traduz o id da resposta)
+        # last_worker: índice do último servidor que executou a tarefa
+        ids = [r["id"] for r in cfg["requisicoes"]]
+        prioridades = [r["prioridade"] for r in cfg["requisicoes"]]
+        remaining = [r["tempo_exec"] for r in cfg["requisicoes"]]
+        last_worker = [None] * len(ids)
+        idx_por_id = {tid: k for k, tid in enumerate(ids)}
+
+        if rr:
+            build_msg = _rr_msg_builder(quantum_f, ids, prioridades, remaining)
+        else:
+            build_msg = _exec_msg_builder(ids, prioridades, remaining)
+
+        # Estado dos servidores em listas paralelas, indexadas pela posição
+        # do servidor em cfg["servidores"]; load/cap ficam no balanceador
+        sids = [s["id"] for s in cfg["servidores"]]
+        cap = [s["capacidade"] for s in cfg["servidores"]]
+        busy = [0.0] * len(sids)
+        idx_por_sid = {sid: i for i, sid in enumerate(sids)}
+
+        balanceador = BALANCEADORES[cfg.get("balanceamento", "menor_carga")](cap)
+
+        conns = list(conexoes.values())
+        # A chave da fila é a própria lista do campo: key(k) == campo[k]
+        campos = {"remaining": remaining, "prioridade": prioridades}
+        scheduler = Scheduler(campos[campo_chave].__getitem__ if campo_chave else None)
+        completed = {}
+        em_execucao = 0
+
+        # Tarefas elegíveis ficam na fila do scheduler enquanto não estão rodando
+        for k, r in enumerate(remaining):
+            if r > 0:
+                scheduler.push(k)
+
+        # Tarefas ainda não concluídas; decrementa a cada conclusão
+        restantes = len(scheduler)
+
+        # Timestamps dos logs só são formatados se o nível INFO estiver ativo
+        verbose = log.isEnabledFor(logging.INFO)
+
+        while restantes > 0:
+            carimbo = ts_ns(time.monotonic_ns() - start) if verbose else ""
+
+            # ============================
+            # ATRIBUIR TAREFAS A SERVIDORES
+            # ============================
+            for k, i in schedule_tick(scheduler, balanceador, last_worker):
+                sid = sids[i]
+                tid = ids[k]
+
+                # primeira vez que a tarefa entra no sistema
+                if tid not in completed:
+                    completed[tid] = {"arrival": start, "end": None}
+
+                enviar_tarefa(conexoes[sid], build_msg(k))
+                em_execucao += 1
+
+                # ***** DETECÇÃO E LOG DE MIGRAÇÃO *****
+                anterior = last_worker[k]
+                if anterior is not None and anterior != i:
+                    # A tarefa estava em um servidor e foi para outro -> MIGRAÇÃO
+                    log.info(
+                        "%s MIGRAÇÃO: Requisição %s (%s) do Servidor %s para o Servidor %s [%s]",
+                        carimbo, tid, prioridade_label(prioridades[k]),
+                        sids[anterior], sid, rotulo,
+                    )
+                else:
+                    # Atribuição normal (sem migração)
+                    log.info(
+                        "%s Requisição %s (%s) atribuída ao Servidor %s [%s]",
+                        carimbo, tid, prioridade_label(prioridades[k]), sid, rotulo,
+                    )
+
+                # Atualiza o último servidor que executou a tarefa
+                last_worker[k] = i
+
+            # ============================
+            # PROCESSAR RESPOSTAS DOS WORKERS
+            # ============================
+            # Entre duas respostas nada muda no estado do escalonador, então
+            # bloqueia até algum worker responder (sem polling) e processa
+            # tudo o que já estiver acumulado nas conexões.
+            respostas = aguardar_respostas(conns, None if em_execucao else 0)
+
+            # Um só relógio para o lote inteiro; as vagas liberadas são
+            # somadas por servidor e devolvidas ao balanceador no fim
+            now2 = time.monotonic_ns()
+            carimbo2 = ts_ns(now2 - start) if verbose else ""
+            liberados = {}
+
+            for resp in respostas:
+                sid = resp["worker"]
+                i = idx_por_sid[sid]
+                busy[i] += resp["duration"]
+                liberados[i] = liberados.get(i, 0) + 1
+
+                # Atualiza a tarefa correspondente
+                k = idx_por_id[resp["id"]]
+                cpu, ram = telemetria.ler(k) if verbose else (0.0, 0.0)
+                remaining[k] = resp["remaining"]
+
+                if resp["remaining"] == 0:
+                    completed[resp["id"]]["end"] = now2
+                    restantes -= 1
+                    log.info(
+                        "%s Servidor %s concluiu Requisição %s | CPU %.1f%% | RAM %.1fMB",
+                        carimbo2, sid, resp["id"], cpu, ram,
+                    )
+                else:
+                    # preemptada: volta para a fila do scheduler
+                    scheduler.push(k)
+                    log.info(
+                        "%s Servidor %s preemptou Requisição %s (restante %.1fs) | CPU %.1f%% | RAM %.1fMB",
+                        carimbo2, sid, resp["id"], resp["remaining"], cpu, ram,
+                    )
 
-    retorno = Queue()
-    filas = {s["id"]: Queue() for s in cfg["servidores"]}
-    estados = {s["id"]: {"cap": s["capacidade"], "load": 0, "busy": 0} for s in cfg["servidores"]}
+            for i, n in liberados.items():
+                balanceador.liberar(i, n)
+            em_execucao -= len(respostas)
 
-    iniciar_workers(cfg["servidores"], filas, retorno)
-    scheduler = Scheduler(policy)
-    completed = {}
+        # ============================
+        # MÉTRICAS FINAIS
+        # ============================
+        total = (time.monotonic_ns() - start) * 1e-9
 
-    while True:
-        now = time.time()
-        elapsed = now - start
+        tempos = [(c["end"] - c["arrival"]) * 1e-9 for c in completed.values()]
+        avg = sum(tempos) / len(tempos)
+        throughput = len(completed) / total
+        util = sum((b / total) * 100 for b in busy) / len(busy)
 
-        # Tarefas elegíveis: não estão rodando e ainda têm tempo restante
-        elegiveis = [t for t in pending if not t["running"] and t["remaining"] > 0]
-        scheduler.reorder(elegiveis)
+        # Relatório montado por inteiro e escrito de uma vez
+        report = [
+            "-" * 60,
+            f"Resultados da política: {rotulo}",
+            f"Tempo médio de resposta: {avg:.2f}s",
+            f"Throughput: {throughput:.2f} tarefas/s",
+        ]
+        for sid, b in zip(sids, busy):
+            report.append(f"Servidor {sid} utilização: {(b/total)*100:.1f}%")
+        report.append("-" * 60)
+        sys.stdout.write("\n".join(report) + "\n")
 
-        # Servidores com espaço disponível (load < capacidade)
-        livres = [sid for sid, st in estados.items() if st["load"] < st["cap"]]
+        return {"tempo_medio": avg, "throughput": throughput, "utilizacao": util}
 
-        # ============================
-        # ATRIBUIR TAREFAS A SERVIDORES
-        # ============================
-        while elegiveis and livres:
-            t = scheduler.next_task(elegiveis)
-
-            # *** LÓGICA DE MIGRAÇÃO AQUI ***
-            # Se a tarefa já rodou em algum servidor (last_worker != None),
-            # tentamos mandá-la para um servidor DIFERENTE (migração).
-            if t["last_worker"] is not None:
-                # candidatos = servidores livres diferentes do último servidor
-                candidatos = [sid for sid in livres if sid != t["last_worker"]]
-                if candidatos:
-                    # escolhe o menos carregado entre os candidatos
-                    sid = min(candidatos, key=lambda x: estados[x]["load"])
-                else:
-                    # se só tiver o mesmo servidor livre, vai nele mesmo
-                    sid = min(livres, key=lambda x: estados[x]["load"])
-            else:
-                # primeira execução dessa tarefa
-                sid = min(livres, key=lambda x: estados[x]["load"])
-
-            t["running"] = True
-
-            # primeira vez que a tarefa entra no sistema
-            if t["id"] not in completed:
-                completed[t["id"]] = {"arrival": t["arrival_time"], "end": None}
-
-            msg = {
-                "id": t["id"],
-                "priority": t["prioridade"],
-                "remaining": t["remaining"]
-            }
-
-            if policy == "rr":
-                msg["slice"] = min(quantum, t["remaining"])
-            else:
-                msg["exec_time"] = t["remaining"]
-
-            enviar_tarefa(filas[sid], msg)
-            estados[sid]["load"] += 1
-
-            # ***** DETECÇÃO E LOG DE MIGRAÇÃO *****
-            if t["last_worker"] is not None and t["last_worker"] != sid:
-                # A tarefa estava em um servidor e foi para outro -> MIGRAÇÃO
-                print(
-                    f"{ts(elapsed)} MIGRAÇÃO: Requisição {t['id']} "
-                    f"({prioridade_label(t['prioridade'])}) "
-                    f"do Servidor {t['last_worker']} para o Servidor {sid} "
-                    f"[{policy.upper()}]"
-                )
-            else:
-                # Atribuição normal (sem migração)
-                print(
-                    f"{ts(elapsed)} Requisição {t['id']} "
-                    f"({prioridade_label(t['prioridade'])}) atribuída ao Servidor {sid} "
-                    f"[{policy.upper()}]"
-                )
-
-            # Atualiza o último servidor que executou a tarefa
-            t["last_worker"] = sid
-
-            # Atualiza lista de servidores livres depois da atribuição
-            livres = [sid for sid, st in estados.items() if st["load"] < st["cap"]]
-
-        # ============================
-        # PROCESSAR RESPOSTAS DOS WORKERS
-        # ============================
-        while True:
-            resp = receber_resposta(retorno, block=False)
-            if not resp:
-                break
-
-            sid = resp["worker"]
-            estados[sid]["busy"] += resp["duration"]
-            estados[sid]["load"] -= 1
-
-            now2 = time.time()
-            elapsed2 = now2 - start
-
-            # Atualiza a tarefa correspondente na lista pending
-            for p in pending:
-                if p["id"] == resp["id"]:
-                    p["remaining"] = resp["remaining"]
-                    p["running"] = False
-                    break
-
-            if resp["remaining"] == 0:
-                completed[resp["id"]]["end"] = now2
-                pending = [p for p in pending if p["id"] != resp["id"]]
-                print(
-                    f"{ts(elapsed2)} Servidor {sid} concluiu Requisição {resp['id']} "
-                    f"| CPU {resp['cpu']:.1f}% | RAM {resp['memory']:.1f}MB"
-                )
-            else:
-                print(
-                    f"{ts(elapsed2)} Servidor {sid} preemptou Requisição {resp['id']} "
-                    f"(restante {resp['remaining']:.1f}s) "
-                    f"| CPU {resp['cpu']:.1f}% | RAM {resp['memory']:.1f}MB"
-                )
-
-        # Condição de parada: todas as tarefas concluídas
-        if all(t["remaining"] == 0 for t in pending):
-            break
-
-        time.sleep(0.05)
-
-    # ============================
-    # MÉTRICAS FINAIS
-    # ============================
-    total = time.time() - start
-
-    tempos = [(c["end"] - c["arrival"]) for c in completed.values()]
-    avg = sum(tempos) / len(tempos)
-    throughput = len(completed) / total
-    util = sum((st["busy"] / total) * 100 for st in estados.values()) / len(estados)
-
-    print("-" * 60)
-    print(f"Resultados da política: {policy.upper()}")
-    print(f"Tempo médio de resposta: {avg:.2f}s")
-    print(f"Throughput: {throughput:.2f} tarefas/s")
-    for sid, st in estados.items():
-        print(f"Servidor {sid} utilização: {(st['busy']/total)*100:.1f}%")
-    print("-" * 60)
-
-    # Encerra workers
-    for q in filas.values():
-        q.put("EXIT")
-
-    return {"tempo_medio": avg, "throughput": throughput, "utilizacao": util}
+    return executar_politica
 
 
 def main():
+    parser = argparse.ArgumentParser(description="BSB Compute – simulador de escalonamento")
+    parser.add_argument("--quiet", action="store_true",
+                        help="omite os logs de cada evento, mostra só os resultados")
+    args = parser.parse_args()
+
+    # Logs de eventos via logging: com --quiet o nível sobe para WARNING e
+    # as mensagens nem chegam a ser formatadas
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(message)s",
+        stream=sys.stdout,
+    )
+
     cfg = carregar_config()
+    validar_config(cfg)
 
     politicas = {
         "RR": "rr",
@@ -195,21 +253,45 @@ def main():
         "PRIORIDADE": "prioridade"
     }
 
-    resultados = {
-        nome: executar_politica(pol, cfg)
-        for nome, pol in politicas.items()
-    }
-
-    print("\n" + "=" * 60)
-    print("                  RESUMO FINAL")
-    print("=" * 60)
-    print("+-------------+--------------+-------------+------------+")
-    print("| Algoritmo   | Tempo Médio  | Throughput  | Utilização |")
-    print("+-------------+--------------+-------------+------------+")
+    # Os mesmos workers atendem as três políticas: cada run termina só
+    # quando todas as respostas chegaram, então não sobra nada nos Pipes
+    telemetria = Telemetria(len(cfg["requisicoes"]))
+    conexoes, workers = iniciar_workers(cfg["servidores"], telemetria.nome)
+
+    try:
+        resultados = {
+            nome: _make_runner(pol)(cfg, conexoes, telemetria)
+            for nome, pol in politicas.items()
+        }
+    finally:
+        # Encerra workers e libera a memória compartilhada mesmo se uma
+        # política falhar; sem isso os workers ficam presos no recv e a
+        # saída do interpretador trava
+        for conn in conexoes.values():
+            try:
+                encerrar_worker(conn)
+            except OSError:
+                pass  # worker já morreu
+        for p in workers:
+            p.join()
+        telemetria.fechar(remover=True)
+
+    separador = "+-------------+--------------+-------------+------------+"
+    linha = "| {:11} | {:12} | {:11} | {:10.1f}% |"
+
+    report = [
+        "",
+        "=" * 60,
+        "                  RESUMO FINAL",
+        "=" * 60,
+        separador,
+        "| Algoritmo   | Tempo Médio  | Throughput  | Utilização |",
+        separador,
+    ]
 
     for nome, r in resultados.items():
-        print(
-            "| {:11} | {:12} | {:11} | {:10.1f}% |".format(
+        report.append(
+            linha.format(
                 nome,
                 f"{r['tempo_medio']:.2f}s",
                 f"{r['throughput']:.2f}/s",
@@ -217,23 +299,20 @@ def main():
             )
         )
 
-    print("+-------------+--------------+-------------+------------+")
-
-    print("\nResumo Geral:")
-    print(
+    report += [
+        separador,
+        "",
+        "Resumo Geral:",
         f"Tempo médio geral: "
-        f"{sum(r['tempo_medio'] for r in resultados.values())/3:.2f}s"
-    )
-    print(
+        f"{sum(r['tempo_medio'] for r in resultados.values())/3:.2f}s",
         f"Throughput médio: "
-        f"{sum(r['throughput'] for r in resultados.values())/3:.2f} tarefas/s"
-    )
-    print(
+        f"{sum(r['throughput'] for r in resultados.values())/3:.2f} tarefas/s",
         f"Utilização média da CPU simulada: "
-        f"{sum(r['utilizacao'] for r in resultados.values())/3:.1f}%"
-    )
-    print("-" * 60)
-    print("TODAS AS POLÍTICAS FORAM SIMULADAS.")
+        f"{sum(r['utilizacao'] for r in resultados.values())/3:.1f}%",
+        "-" * 60,
+        "TODAS AS POLÍTICAS FORAM SIMULADAS.",
+    ]
+    sys.stdout.write("\n".join(report) + "\n")
 
 
 if __name__ == "__main__":
@@ -1,16 +1,190 @@
-class Scheduler:
+import heapq
+import random
+from collections import deque
+from itertools import count
+
+
+# Política -> campo da tarefa usado como chave da fila de prontos
+# (None = FIFO, usado no RR)
+CHAVES = {
+    "rr": None,
+    "sjf": "remaining",
+    "prioridade": "prioridade",
+}
 
-    def __init__(self, policy="prioridade"):
-        self.policy = policy
 
-    def reorder(self, fila):
-        if not fila:
+class Scheduler:
+    # Fila de tarefas prontas. Com key: heap de (chave, seq, tarefa), o seq
+    # desempata pela ordem de entrada. Sem key (RR): deque FIFO, preemptadas
+    # voltam para o fim. push/pop_next são ligados uma vez no __init__, sem
+    # testar a política a cada operação.
+
+    def __init__(self, key=None):
+        if key is None:
+            self._fila = deque()
+            self.push = self._fila.append
+            self.pop_next = self._fila.popleft
             return
 
-        if self.policy == "sjf":
-            fila.sort(key=lambda t: t["remaining"])
-        elif self.policy == "prioridade":
-            fila.sort(key=lambda t: t["prioridade"])
+        fila = self._fila = []
+        seq = count()
+
+        def push(task):
+            heapq.heappush(fila, (key(task), next(seq), task))
+
+        def pop_next():
+            return heapq.heappop(fila)[2]
+
+        self.push = push
+        self.pop_next = pop_next
+
+    def __len__(self):
+        return len(self._fila)
+
+
+class BalanceadorMenorCarga:
+    # Min-heap de (load, ordem, índice): o topo é sempre o servidor menos
+    # carregado. Em caso de empate ganha o escolhido há mais tempo (ordem),
+    # o que distribui em rodízio em vez de empilhar tudo no primeiro servidor.
+    # Entradas obsoletas são descartadas quando chegam ao topo; um novo
+    # push acontece sempre que a carga de um servidor muda. Como entradas de
+    # servidores lotados podem nunca chegar ao topo, o heap é reconstruído
+    # só com as entradas válidas quando passa de _limite entradas.
+
+    def __init__(self, capacidades):
+        self.cap = list(capacidades)
+        self.load = [0] * len(self.cap)
+        self.vagas = sum(self.cap)
+        self._ordem = list(range(len(self.cap)))
+        self._escolhas = count(len(self.cap))
+        self._heap = [(0, o, i) for i, o in enumerate(self._ordem)]
+        self._limite = 2 * len(self.cap) + 8
+
+    def _push(self, i):
+        heapq.heappush(self._heap, (self.load[i], self._ordem[i], i))
+        if len(self._heap) > self._limite:
+            self._reconstruir()
+
+    def _reconstruir(self):
+        # Uma entrada por servidor com vaga; custo O(S) a cada ~S pushes
+        load, cap, ordens = self.load, self.cap, self._ordem
+        self._heap = [(load[i], ordens[i], i) for i in range(len(cap)) if load[i] < cap[i]]
+        heapq.heapify(self._heap)
+
+    def _pop_livre(self):
+        # referências locais: este laço roda a cada escolha de servidor
+        heap, load, cap, ordens = self._heap, self.load, self.cap, self._ordem
+        heappop = heapq.heappop
+        while heap:
+            carga, ordem, i = heappop(heap)
+            if carga == load[i] and ordem == ordens[i] and carga < cap[i]:
+                return i
+        return None
+
+    def escolher(self, evitar=None):
+        # Retorna o índice do servidor escolhido; evitar é o índice do
+        # último servidor da tarefa (None na primeira execução)
+        primeiro = self._pop_livre()
+        if primeiro is None or primeiro != evitar:
+            return primeiro
+
+        # Migração: o topo é o último servidor da tarefa, então usa o
+        # segundo colocado (se houver) e devolve o primeiro ao heap.
+        segundo = self._pop_livre()
+        while segundo == primeiro:
+            # entrada duplicada do mesmo servidor com a mesma carga
+            segundo = self._pop_livre()
+        if segundo is None:
+            return primeiro
+
+        self._push(primeiro)
+        return segundo
+
+    def ocupar(self, i):
+        self.load[i] += 1
+        self.vagas -= 1
+        self._ordem[i] = next(self._escolhas)
+        self._push(i)
+
+    def liberar(self, i, n=1):
+        self.load[i] -= n
+        self.vagas += n
+        self._push(i)
+
+
+class BalanceadorP2C:
+    # Power-of-Two-Choices: sorteia dois servidores livres e fica com o
+    # menos carregado. Seleção O(1) e sem o viés de sempre empilhar
+    # tarefas no primeiro servidor quando as cargas empatam.
+
+    def __init__(self, capacidades):
+        self.cap = list(capacidades)
+        self.load = [0] * len(self.cap)
+        self.vagas = sum(self.cap)
+        # servidores com load < cap; _pos permite remoção O(1) (swap com o último)
+        self._livres = [i for i, c in enumerate(self.cap) if c > 0]
+        self._pos = {i: k for k, i in enumerate(self._livres)}
+
+    def escolher(self, evitar=None):
+        livres = self._livres
+        n = len(livres)
+        if n < 2:
+            return livres[0] if livres else None
+
+        ka = random.randrange(n)
+        kb = random.randrange(n - 1)
+        if kb >= ka:
+            kb += 1
+        a, b = livres[ka], livres[kb]
+
+        # Migração: o último servidor da tarefa perde o sorteio
+        if a == evitar:
+            return b
+        if b == evitar:
+            return a
+        return a if self.load[a] <= self.load[b] else b
+
+    def ocupar(self, i):
+        self.load[i] += 1
+        self.vagas -= 1
+        if self.load[i] == self.cap[i]:
+            k = self._pos.pop(i)
+            ultimo = self._livres.pop()
+            if ultimo != i:
+                self._livres[k] = ultimo
+                self._pos[ultimo] = k
+
+    def liberar(self, i, n=1):
+        if self.load[i] == self.cap[i]:
+            self._pos[i] = len(self._livres)
+            self._livres.append(i)
+        self.load[i] -= n
+        self.vagas += n
+
+
+def schedule_tick(scheduler, balanceador, last_worker):
+    # Gera pares (índice da tarefa, índice do servidor) enquanto houver tarefa pronta
+    # e vaga em algum servidor, já marcando o servidor como ocupado.
+    # Nada é reconstruído: a tarefa sai da fila do scheduler e o servidor
+    # vem do balanceador, ambos em O(log n) ou melhor.
+    # Os métodos usados no laço são resolvidos uma vez só.
+    pop_next = scheduler.pop_next
+    escolher = balanceador.escolher
+    ocupar = balanceador.ocupar
+
+    while scheduler and balanceador.vagas > 0:
+        k = pop_next()
+
+        # *** LÓGICA DE MIGRAÇÃO AQUI ***
+        # Se a tarefa já rodou em algum servidor (last_worker != None),
+        # o balanceador tenta mandá-la para um servidor DIFERENTE
+        # (migração); se só o mesmo servidor estiver livre, vai nele mesmo.
+        i = escolher(last_worker[k])
+        ocupar(i)
+        yield k, i
+
 
-    def next_task(self, fila):
-        return fila.pop(0)
+BALANCEADORES = {
+    "menor_carga": BalanceadorMenorCarga,
+    "p2c": BalanceadorP2C,
+}
@@ -6,6 +6,11 @@ def ts(elapsed_seconds):
     s = int(elapsed_seconds % 60)
     return f"[{m:02d}:{s:02d}]"
 
+def ts_ns(elapsed_ns):
+    # Mesmo formato de ts, a partir de nanossegundos inteiros (monotonic_ns)
+    s = elapsed_ns // 1_000_000_000
+    return f"[{s // 60:02d}:{s % 60:02d}]"
+
 def salvar_relatorio(texto, nome):
     base = os.path.dirname(os.path.abspath(__file__))
     caminho = os.path.join(base, "..", nome)
@@ -1,7 +1,7 @@
 import time
 import psutil
-from multiprocessing import Process
-from queue import Empty
+from multiprocessing import Pipe, Process
+from ipc import receber_tarefa, enviar_resposta, Telemetria
 
 
 def simular_metricas(work):
@@ -10,46 +10,50 @@ def simular_metricas(work):
     return cpu, ram
 
 
-def worker_loop(worker_id, fila_entrada, fila_retorno):
+def worker_loop(worker_id, conn, nome_telemetria):
     proc = psutil.Process()
+    telemetria = Telemetria(nome=nome_telemetria)
 
     while True:
         try:
-            msg = fila_entrada.get(timeout=0.2)
-        except Empty:
-            continue
-
-        if not isinstance(msg, dict):
+            msg = receber_tarefa(conn)
+        except EOFError:
             break
-        if msg.get("EXIT", False) or msg == "EXIT":
+
+        if msg is None:
             break
 
-        if "slice" in msg:
-            work = float(msg["slice"])
-            time.sleep(work)
-            remaining = msg["remaining"] - work
-        else:
-            work = float(msg["exec_time"])
-            time.sleep(work)
-            remaining = 0.0
+        # work é a fatia (RR) ou o tempo restante inteiro (SJF/Prioridade),
+        # então no segundo caso remaining chega a zero
+        work = msg["work"]
+        time.sleep(work)
+        remaining = msg["remaining"] - work
 
+        # métricas vão para a memória compartilhada antes da resposta,
+        # assim o orquestrador já as encontra ao receber o evento
         cpu_sim, ram_sim = simular_metricas(work)
+        telemetria.escrever(msg["slot"], cpu_sim, ram_sim)
 
-        fila_retorno.put({
+        enviar_resposta(conn, {
             "id": msg["id"],
             "worker": worker_id,
             "duration": work,
-            "remaining": max(0.0, remaining),
-            "cpu": cpu_sim,
-            "memory": ram_sim
+            "remaining": max(0.0, remaining)
         })
 
+    telemetria.fechar()
+
 
-def iniciar_workers(cfg, filas, retorno):
+def iniciar_workers(cfg, nome_telemetria):
+    # Um Pipe duplex por worker: o orquestrador envia tarefas e recebe as
+    # respostas pela mesma conexão
+    conexoes = {}
     procs = []
     for s in cfg:
         sid = s["id"]
-        p = Process(target=worker_loop, args=(sid, filas[sid], retorno))
+        conn_pai, conn_filho = Pipe()
+        p = Process(target=worker_loop, args=(sid, conn_filho, nome_telemetria))
         p.start()
+        conexoes[sid] = conn_pai
         procs.append(p)
-    return procs
+    return conexoes, procs